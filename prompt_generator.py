@@ -0,0 +1,410 @@
+"""Generation helpers kept out of the Streamlit script
+
+Streamlit re-executes prompt_generator_app.py on every rerun, so anything meant to be
+built once per process (caches, classes shared with st.cache_resource objects) lives here.
+"""
+import streamlit as st
+import asyncio
+import functools
+import hashlib
+import os
+import random
+from typing import AsyncIterator, Final, List, Optional, Union
+from pydantic import BaseModel, ConfigDict
+
+# openai, httpx, jiter and dotenv are imported where they are used to keep
+# them off the app's cold start
+
+
+@functools.cache
+def _load_env() -> None:
+    """Load environment variables from .env file (local development)"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+@functools.cache
+def _secrets() -> dict:
+    """Snapshot of Streamlit secrets, empty when no secrets file is configured"""
+    if not hasattr(st, 'secrets'):
+        return {}
+    try:
+        return dict(st.secrets)
+    except FileNotFoundError:
+        return {}
+
+
+@functools.cache
+def get_secret(key: str) -> Optional[str]:
+    """Get secret from Streamlit secrets or environment variables
+    
+    Priority:
+    1. Streamlit secrets (for production/Streamlit Cloud)
+    2. Environment variables (for local development with .env)
+    """
+    # Try Streamlit secrets first (production)
+    secrets = _secrets()
+    if key in secrets:
+        return secrets[key]
+    
+    # Fallback to environment variables (local development)
+    _load_env()
+    return os.getenv(key)
+
+
+class TruncatedResponseError(Exception):
+    """Raised when the model hit the token cap before completing its response"""
+
+
+def check_finish_reason(finish_reason: Optional[str]):
+    """Raise if the model stopped before completing its response"""
+    if finish_reason == "length":
+        raise TruncatedResponseError("Réponse tronquée : la limite de tokens a été atteinte")
+
+
+# Base system message for the generation call
+_BASE_SYSTEM: Final[str] = "You are an expert at creating effective system prompts for AI assistants."
+
+# Best practices and reference examples, sent as a second system message so the long
+# prefix is identical across users (required for Azure OpenAI prompt caching)
+_EXAMPLES_AND_RULES: Final[str] = """You are an expert in creating high-quality system prompts for AI assistants.
+Based on the following information provided by the user, create a comprehensive, well-structured system prompt that will guide an AI assistant's behavior.
+
+You also need to generate 4-5 realistic example questions that users might ask this AI assistant based on its role and domain.
+
+**Best Practices for System Prompts:**
+- Start with a clear role definition
+- Specify the assistant's expertise and knowledge domain
+- Define behavioral guidelines and constraints
+- Include tone and communication style instructions
+- Address edge cases and special scenarios
+- Be specific and actionable
+- Use clear, structured language
+- Include examples when relevant
+
+**Examples of Well-Structured System Prompts for Inspiration:**
+
+Example 1 - E-commerce Assistant (Glisshop):
+```
+You are an advanced AI sales assistant representing Glisshop, an e-commerce store specialized in winter sports and outdoor gear. Your mission is to guide customers throughout their shopping journey: recommending products, answering pre-sales questions, and providing relevant post-sales support.
+
+You must ONLY use information and URLs that are EXPLICITLY provided in the search results given to you. NEVER use or reference any URLs, products, or information that does not appear in these search results. If certain information is not available in the results, politely inform the customer that you don't have that specific information.
+
+Your objectives are to:
+- Enhance the customer experience
+- Increase conversion and average order value
+- Ensure accurate, fast, and friendly assistance
+
+Guidelines for Response:
+- If the user sends a message with only one or two words (e.g., "Retour", "Randonnée bivouac"), you HAVE TO ask them to provide more details or clarify their question before you continue.
+- Only rely on the information provided in the search results. Never guess, invent, or modify product information or URL links.
+- Share links ONLY if they appear in the search results provided to you. Never create, modify, or assume URLs exist.
+- Before recommending any product, YOU MUST ALWAYS ask at least two clarifying questions to better understand the customer's needs (e.g., use, budget, size).
+- Only suggest complementary products (e.g., helmet with skis) if they actually appear in the provided search results.
+- Include product links with descriptive anchor text (NEVER naked or invented URLs).
+- If the search results don't contain certain requested information, clearly state that you don't have this information and suggest contacting customer service or offer to talk to a human.
+- Adopt a friendly tone but not too excited, and always use the "vous" form.
+- When providing recommendations, limit the examples to 3.
+
+Conditional Instructions:
+- If a question concerns ski boots AND the link https://www.glisshop.com/conseils/taille-chaussure-ski.html appears in your search results, then include this link in your answer.
+- When suggesting a product, only give the specific product link if it appears in the search results. Never construct or guess product URLs.
+- Only mention products that are in stock (not marked as "épuisé") IF this information is available in the search results.
+
+Protocol for Answering:
+- For product search: Recommend products that are present in the results.
+- For product inquiry: Provide information using only verified data from the results.
+- For pre/post-sales questions: Answer using only information from the results.
+- If you don't have the answer just say "Je ne sais pas répondre à cette question, pouvez-vous reformuler ? A moins que vous ne vouliez parler à un humain ?"
+
+Fallback Response:
+If none of the search results contain relevant information for the query, respond with: "Je n'ai pas trouvé d'informations spécifiques sur ce sujet dans ma base de connaissances actuelle. Pour obtenir des informations précises, je vous invite à contacter notre service client."
+
+You always HAVE TO end every conversation with: "Votre avis nous est précieux ! N'hésitez pas à noter la conversation." (translate if conversation is not in French)
+
+Add subtle emojis: for example green ✅ for strengths, red ❌ for weaknesses, keeping it professional.
+```
+
+Example 2 - Technical Support Assistant:
+```
+You are a technical support specialist for a SaaS company providing project management software. Your role is to help users troubleshoot issues, understand features, and optimize their use of the platform.
+
+Core Responsibilities:
+- Diagnose and resolve technical issues
+- Provide clear step-by-step instructions
+- Escalate complex problems when necessary
+- Document common issues and solutions
+
+Communication Guidelines:
+- Be patient and empathetic, especially with frustrated users
+- Use simple language, avoiding unnecessary jargon
+- Break down complex solutions into manageable steps
+- Always confirm understanding before closing the conversation
+- Respond within 2-3 minutes maximum
+
+Constraints:
+- Never ask for passwords or sensitive credentials
+- Do not make promises about feature releases or timelines
+- Always verify user identity before accessing account details
+- Escalate to senior support for billing or account termination requests
+
+When uncertain:
+If you don't have enough information to provide a solution, ask clarifying questions about:
+- The exact steps that led to the issue
+- Any error messages received
+- The user's browser/device/OS version
+- Whether the issue is reproducible
+```
+
+Example 3 - Customer Service Assistant (Banking):
+```
+You are a customer service representative for a digital bank. Your mission is to assist customers with account inquiries, transaction questions, and general banking support while maintaining the highest standards of security and professionalism.
+
+Key Principles:
+- Security first: Never request or share sensitive information (passwords, PINs, full card numbers)
+- Accuracy: Only provide information you are certain about
+- Compliance: Adhere to banking regulations and privacy laws at all times
+
+Your Tone Should Be:
+- Professional yet warm
+- Reassuring, especially regarding security concerns
+- Clear and concise, avoiding banking jargon
+- Patient with less tech-savvy customers
+
+What You Can Help With:
+- Account balance and transaction history inquiries
+- Explanation of fees and charges
+- Card activation and replacement
+- General product information
+- Directing customers to appropriate resources
+
+What Requires Escalation:
+- Fraud reports or suspicious activity
+- Loan applications or modifications
+- Account closures
+- Disputes exceeding $500
+- Legal or regulatory inquiries
+
+Standard Responses:
+- For security verification: "For your security, I'll need to verify your identity. Can you please provide [specific non-sensitive information]?"
+- For out-of-scope requests: "I understand this is important. For [specific issue], I'll need to connect you with our specialized team who can assist you better."
+- For unclear requests: "To help you more effectively, could you provide more details about [specific aspect]?"
+```
+
+Now, based on the user's answers below and inspired by the structure and clarity of these examples, you need to generate TWO things:
+
+1. **system_prompt**: A professional, comprehensive system prompt that incorporates all the information provided below. 
+   The prompt should be:
+   - Ready to use directly as a system message
+   - Well-structured with clear sections
+   - Specific and actionable
+   - Professional yet natural
+
+2. **example_questions**: A list of 4-5 realistic questions that users might ask this AI assistant, based on:
+   - The assistant's domain and role
+   - Common scenarios in this context
+   - Different types of inquiries (simple, complex, edge cases)
+   - Varied question formats (short/long, general/specific)
+
+Examples of good example_questions for different domains:
+- E-commerce: "Quelles chaussures de running recommandez-vous pour un débutant ?", "Comment retourner un article ?", "Avez-vous des promotions en cours ?", "Quelle est la durée de livraison ?"
+- Tech Support: "Mon application ne se lance pas, que faire ?", "Comment réinitialiser mon mot de passe ?", "L'export Excel ne fonctionne plus"
+- Banking: "Quel est mon solde actuel ?", "Comment activer ma carte bancaire ?", "Puis-je augmenter mon plafond de paiement ?"
+
+Return your response in the following JSON structure."""
+
+# Connection pool limits for the Azure OpenAI client (the httpx defaults throttle concurrent calls)
+_AZURE_MAX_CONNECTIONS: Final[int] = 64
+_AZURE_MAX_KEEPALIVE_CONNECTIONS: Final[int] = 32
+
+# Sampling temperature for prompt generation
+_GENERATION_TEMPERATURE: Final[float] = 0.7
+
+# Output token cap for generation: prompts typically run 800-1500 tokens, plus JSON
+# escaping and example questions. Truncated generations raise TruncatedResponseError.
+_GENERATION_MAX_TOKENS: Final[int] = 2500
+
+# Minimum number of new response characters between two streamed preview updates
+_STREAM_PREVIEW_CHARS: Final[int] = 200
+
+# Bump when the way generation messages are built changes (e.g. _build_messages),
+# so cached prompts from the previous version are no longer served
+_GENERATION_VERSION: Final[str] = "2"
+
+# Headings of the user's answers in the final user message, in display order
+_ANSWER_LABELS: Final[dict] = {
+    'activite': "Activité et rôle de l'assistant IA",
+    'regles': "Règles absolues à respecter",
+    'personnalite': "Personnalité de l'assistant",
+    'scenarios': "Scénarios spécifiques"
+}
+
+
+class PromptWithExamples(BaseModel):
+    """Model for system prompt with example questions"""
+    # Strict structured outputs require additionalProperties: false in the schema
+    model_config = ConfigDict(extra="forbid")
+    
+    system_prompt: str
+    example_questions: List[str]
+
+
+# Structured output format, built once instead of introspecting the model on every call
+_RESPONSE_FORMAT: Final[dict] = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "PromptWithExamples",
+        "schema": PromptWithExamples.model_json_schema(),
+        "strict": True
+    }
+}
+
+
+# Fingerprint of everything besides the answers that shapes a generated prompt,
+# included in cache keys so a change to the prompt or settings invalidates old entries
+GENERATION_FINGERPRINT: Final[str] = hashlib.sha256("|".join([
+    _GENERATION_VERSION,
+    _BASE_SYSTEM,
+    _EXAMPLES_AND_RULES,
+    repr(_ANSWER_LABELS),
+    repr(_RESPONSE_FORMAT),
+    str(_GENERATION_TEMPERATURE),
+    str(_GENERATION_MAX_TOKENS)
+]).encode()).hexdigest()
+
+
+class PromptGenerator:
+    """Handles Azure OpenAI integration for prompt generation"""
+    
+    def __init__(self, model_name: str = 'gpt-4o-mini'):
+        self.model_name = model_name
+        
+        # Select credentials based on model (using get_secret for compatibility)
+        if model_name == 'gpt-4o-mini':
+            api_key = get_secret("GPT4_MINI_API_KEY")
+            endpoint = get_secret("GPT4_MINI_ENDPOINT")
+            self.deployment = get_secret("GPT4_MINI_DEPLOYMENT")
+        else:  # gpt-o3-mini
+            api_key = get_secret("GPT3_MINI_API_KEY")
+            endpoint = get_secret("GPT3_MINI_ENDPOINT")
+            self.deployment = get_secret("GPT3_MINI_DEPLOYMENT")
+        
+        # Validate credentials
+        if not all([api_key, endpoint, self.deployment]):
+            missing = []
+            if not api_key: missing.append("API Key")
+            if not endpoint: missing.append("Endpoint")
+            if not self.deployment: missing.append("Deployment")
+            raise ValueError(f"Missing {model_name} credentials: {', '.join(missing)}")
+        
+        # Initialize client
+        import httpx
+        from openai import AsyncAzureOpenAI
+        
+        self.client = AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=endpoint,
+            api_version="2024-12-01-preview",
+            http_client=httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=_AZURE_MAX_CONNECTIONS,
+                        max_keepalive_connections=_AZURE_MAX_KEEPALIVE_CONNECTIONS
+                    )
+                )
+            )
+        )
+    
+    async def generate_n(self, answers: dict, n: int = 3) -> List[tuple[str, List[str]]]:
+        """Generate n prompt variants concurrently, each with a random seed
+        
+        Seeds are drawn on every call so regenerating yields new phrasings.
+        
+        Returns:
+            list: [(system_prompt, example_questions), ...]
+        """
+        return await asyncio.gather(
+            *[self._generate_one(answers, seed=random.randrange(2**31)) for _ in range(n)]
+        )
+    
+    async def stream_system_prompt(self, answers: dict) -> AsyncIterator[Union[dict, PromptWithExamples]]:
+        """Generate a system prompt and example questions, streaming the response
+        
+        Yields:
+            dict: partially parsed response every _STREAM_PREVIEW_CHARS characters, for preview only
+            PromptWithExamples: the strictly validated complete response, yielded last
+        """
+        from jiter import from_json
+        
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.deployment,
+                messages=self._build_messages(answers),
+                response_format=_RESPONSE_FORMAT,
+                temperature=_GENERATION_TEMPERATURE,
+                max_tokens=_GENERATION_MAX_TOKENS,
+                stream=True
+            )
+            
+            content = ""
+            previewed = 0
+            finish_reason = None
+            async for chunk in stream:
+                # Azure sends content filter results in chunks without choices
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                if choice.delta.content:
+                    content += choice.delta.content
+                    # Re-parse for the preview only once enough new text has arrived
+                    if len(content) - previewed >= _STREAM_PREVIEW_CHARS:
+                        previewed = len(content)
+                        yield from_json(content.encode(), partial_mode="trailing-strings")
+            
+            # Partial parsing accepts cut-off JSON, so check completion explicitly
+            check_finish_reason(finish_reason)
+            yield PromptWithExamples.model_validate_json(content)
+        
+        except TruncatedResponseError:
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de la génération du prompt: {str(e)}")
+    
+    def _build_messages(self, answers: dict) -> List[dict]:
+        """Build the chat messages for a generation call"""
+        # Only the user's answers vary between calls; blank answers are left out
+        filled = [
+            (label, answers[key].strip())
+            for key, label in _ANSWER_LABELS.items()
+            if answers.get(key) and answers[key].strip()
+        ]
+        sections = [f"{idx}. **{label}:**\n{value}" for idx, (label, value) in enumerate(filled, 1)]
+        prompt = "**User's Answers:**\n\n" + "\n\n".join(sections)
+        return [
+            {"role": "system", "content": _BASE_SYSTEM},
+            {"role": "system", "content": _EXAMPLES_AND_RULES},
+            {"role": "user", "content": prompt}
+        ]
+    
+    async def _generate_one(self, answers: dict, seed: Optional[int] = None) -> tuple[str, List[str]]:
+        """Run a single generation call"""
+        try:
+            completion = await self.client.chat.completions.create(
+                model=self.deployment,
+                messages=self._build_messages(answers),
+                response_format=_RESPONSE_FORMAT,
+                temperature=_GENERATION_TEMPERATURE,
+                max_tokens=_GENERATION_MAX_TOKENS,
+                seed=seed
+            )
+            
+            check_finish_reason(completion.choices[0].finish_reason)
+            result = PromptWithExamples.model_validate_json(completion.choices[0].message.content)
+            return result.system_prompt, result.example_questions
+        
+        except TruncatedResponseError:
+            raise
+        except Exception as e:
+            raise Exception(f"Erreur lors de la génération du prompt: {str(e)}")
@@ -1,273 +1,92 @@
 import streamlit as st
+import asyncio
+import dbm
+import hashlib
 import os
+import shelve
+import threading
+import time
 import uuid
-import requests
-from typing import Optional, List
-from dotenv import load_dotenv
-from openai import AzureOpenAI
-from pydantic import BaseModel
+from collections import OrderedDict
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Final, Iterator, Optional, List
+from prompt_generator import GENERATION_FINGERPRINT, PromptGenerator, PromptWithExamples, TruncatedResponseError
 
-# Load environment variables from .env file (local development)
-load_dotenv()
+# openai, httpx and orjson are imported where they are used to keep
+# them off the app's cold start
+if TYPE_CHECKING:
+    import httpx
 
 
-def get_secret(key: str) -> Optional[str]:
-    """Get secret from Streamlit secrets or environment variables
-    
-    Priority:
-    1. Streamlit secrets (for production/Streamlit Cloud)
-    2. Environment variables (for local development with .env)
-    """
-    # Try Streamlit secrets first (production)
-    if hasattr(st, 'secrets') and key in st.secrets:
-        return st.secrets[key]
-    
-    # Fallback to environment variables (local development)
-    return os.getenv(key)
+# Intended output token cap for chatbot replies. Not sent yet: the Tolk.ai promptConfig
+# field for it is unconfirmed and unknown fields may be rejected by the API.
+_CHAT_MAX_TOKENS: Final[int] = 400
 
+# Retry policy for transient Tolk.ai errors: connection failures are retried by the
+# httpx transport, retryable HTTP statuses by send_message
+_TOLK_CONNECT_RETRIES: Final[int] = 3
+_TOLK_MAX_RETRIES: Final[int] = 3
+_TOLK_RETRY_STATUSES: Final[frozenset] = frozenset({429, 500, 502, 503, 504})
 
-class PromptWithExamples(BaseModel):
-    """Model for system prompt with example questions"""
-    system_prompt: str
-    example_questions: List[str]
+# How long generated prompts are reused for identical answers, in memory and on disk (seconds)
+_GENERATION_CACHE_TTL: Final[int] = 3600
 
+# Maximum number of generated prompts kept in memory (oldest evicted first)
+_GENERATION_CACHE_MAX_ENTRIES: Final[int] = 256
 
-class PromptGenerator:
-    """Handles Azure OpenAI integration for prompt generation"""
+# Location of the persistent cache of generated prompts, next to this script
+_DISK_CACHE_PATH: Final[str] = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".genii_cache.db")
+
+@st.cache_resource(show_spinner=False)
+def _tolk_client() -> "httpx.AsyncClient":
+    """Get the HTTP/2 client used for Tolk.ai calls, kept alive across reruns
     
-    def __init__(self, model_name: str = 'gpt-4o-mini'):
-        self.model_name = model_name
-        
-        # Select credentials based on model (using get_secret for compatibility)
-        if model_name == 'gpt-4o-mini':
-            api_key = get_secret("GPT4_MINI_API_KEY")
-            endpoint = get_secret("GPT4_MINI_ENDPOINT")
-            self.deployment = get_secret("GPT4_MINI_DEPLOYMENT")
-        else:  # gpt-o3-mini
-            api_key = get_secret("GPT3_MINI_API_KEY")
-            endpoint = get_secret("GPT3_MINI_ENDPOINT")
-            self.deployment = get_secret("GPT3_MINI_DEPLOYMENT")
-        
-        # Validate credentials
-        if not all([api_key, endpoint, self.deployment]):
-            missing = []
-            if not api_key: missing.append("API Key")
-            if not endpoint: missing.append("Endpoint")
-            if not self.deployment: missing.append("Deployment")
-            raise ValueError(f"Missing {model_name} credentials: {', '.join(missing)}")
-        
-        # Initialize client
-        self.client = AzureOpenAI(
-            api_key=api_key,
-            azure_endpoint=endpoint,
-            api_version="2024-12-01-preview"
-        )
+    Concurrent chat requests are multiplexed over the same kept-alive connection.
+    Must be called from the script thread (st.cache_resource needs its context),
+    while the client itself is only used from the shared background loop (see run_async).
+    """
+    import httpx
     
-    def generate_system_prompt(self, answers: dict) -> tuple[str, List[str]]:
-        """Generate a system prompt and example questions based on user answers
-        
-        Returns:
-            tuple: (system_prompt, example_questions)
-        """
-        
-        # Construct the generation prompt
-        prompt = f"""You are an expert in creating high-quality system prompts for AI assistants.
-Based on the following information provided by the user, create a comprehensive, well-structured system prompt that will guide an AI assistant's behavior.
-
-You also need to generate 4-5 realistic example questions that users might ask this AI assistant based on its role and domain.
-
-**User's Answers:**
-
-1. **Activité et rôle de l'assistant IA:**
-{answers.get('activite', 'Non spécifié')}
-
-2. **Règles absolues à respecter:**
-{answers.get('regles', 'Non spécifié')}
-
-3. **Personnalité de l'assistant:**
-{answers.get('personnalite', 'Non spécifié')}
-
-4. **Scénarios spécifiques:**
-{answers.get('scenarios', 'Non spécifié')}
-
-**Best Practices for System Prompts:**
-- Start with a clear role definition
-- Specify the assistant's expertise and knowledge domain
-- Define behavioral guidelines and constraints
-- Include tone and communication style instructions
-- Address edge cases and special scenarios
-- Be specific and actionable
-- Use clear, structured language
-- Include examples when relevant
-
-**Examples of Well-Structured System Prompts for Inspiration:**
-
-Example 1 - E-commerce Assistant (Glisshop):
-```
-You are an advanced AI sales assistant representing Glisshop, an e-commerce store specialized in winter sports and outdoor gear. Your mission is to guide customers throughout their shopping journey: recommending products, answering pre-sales questions, and providing relevant post-sales support.
-
-You must ONLY use information and URLs that are EXPLICITLY provided in the search results given to you. NEVER use or reference any URLs, products, or information that does not appear in these search results. If certain information is not available in the results, politely inform the customer that you don't have that specific information.
-
-Your objectives are to:
-- Enhance the customer experience
-- Increase conversion and average order value
-- Ensure accurate, fast, and friendly assistance
-
-Guidelines for Response:
-- If the user sends a message with only one or two words (e.g., "Retour", "Randonnée bivouac"), you HAVE TO ask them to provide more details or clarify their question before you continue.
-- Only rely on the information provided in the search results. Never guess, invent, or modify product information or URL links.
-- Share links ONLY if they appear in the search results provided to you. Never create, modify, or assume URLs exist.
-- Before recommending any product, YOU MUST ALWAYS ask at least two clarifying questions to better understand the customer's needs (e.g., use, budget, size).
-- Only suggest complementary products (e.g., helmet with skis) if they actually appear in the provided search results.
-- Include product links with descriptive anchor text (NEVER naked or invented URLs).
-- If the search results don't contain certain requested information, clearly state that you don't have this information and suggest contacting customer service or offer to talk to a human.
-- Adopt a friendly tone but not too excited, and always use the "vous" form.
-- When providing recommendations, limit the examples to 3.
-
-Conditional Instructions:
-- If a question concerns ski boots AND the link https://www.glisshop.com/conseils/taille-chaussure-ski.html appears in your search results, then include this link in your answer.
-- When suggesting a product, only give the specific product link if it appears in the search results. Never construct or guess product URLs.
-- Only mention products that are in stock (not marked as "épuisé") IF this information is available in the search results.
-
-Protocol for Answering:
-- For product search: Recommend products that are present in the results.
-- For product inquiry: Provide information using only verified data from the results.
-- For pre/post-sales questions: Answer using only information from the results.
-- If you don't have the answer just say "Je ne sais pas répondre à cette question, pouvez-vous reformuler ? A moins que vous ne vouliez parler à un humain ?"
-
-Fallback Response:
-If none of the search results contain relevant information for the query, respond with: "Je n'ai pas trouvé d'informations spécifiques sur ce sujet dans ma base de connaissances actuelle. Pour obtenir des informations précises, je vous invite à contacter notre service client."
-
-You always HAVE TO end every conversation with: "Votre avis nous est précieux ! N'hésitez pas à noter la conversation." (translate if conversation is not in French)
-
-Add subtle emojis: for example green ✅ for strengths, red ❌ for weaknesses, keeping it professional.
-```
-
-Example 2 - Technical Support Assistant:
-```
-You are a technical support specialist for a SaaS company providing project management software. Your role is to help users troubleshoot issues, understand features, and optimize their use of the platform.
-
-Core Responsibilities:
-- Diagnose and resolve technical issues
-- Provide clear step-by-step instructions
-- Escalate complex problems when necessary
-- Document common issues and solutions
-
-Communication Guidelines:
-- Be patient and empathetic, especially with frustrated users
-- Use simple language, avoiding unnecessary jargon
-- Break down complex solutions into manageable steps
-- Always confirm understanding before closing the conversation
-- Respond within 2-3 minutes maximum
-
-Constraints:
-- Never ask for passwords or sensitive credentials
-- Do not make promises about feature releases or timelines
-- Always verify user identity before accessing account details
-- Escalate to senior support for billing or account termination requests
-
-When uncertain:
-If you don't have enough information to provide a solution, ask clarifying questions about:
-- The exact steps that led to the issue
-- Any error messages received
-- The user's browser/device/OS version
-- Whether the issue is reproducible
-```
-
-Example 3 - Customer Service Assistant (Banking):
-```
-You are a customer service representative for a digital bank. Your mission is to assist customers with account inquiries, transaction questions, and general banking support while maintaining the highest standards of security and professionalism.
-
-Key Principles:
-- Security first: Never request or share sensitive information (passwords, PINs, full card numbers)
-- Accuracy: Only provide information you are certain about
-- Compliance: Adhere to banking regulations and privacy laws at all times
-
-Your Tone Should Be:
-- Professional yet warm
-- Reassuring, especially regarding security concerns
-- Clear and concise, avoiding banking jargon
-- Patient with less tech-savvy customers
-
-What You Can Help With:
-- Account balance and transaction history inquiries
-- Explanation of fees and charges
-- Card activation and replacement
-- General product information
-- Directing customers to appropriate resources
-
-What Requires Escalation:
-- Fraud reports or suspicious activity
-- Loan applications or modifications
-- Account closures
-- Disputes exceeding $500
-- Legal or regulatory inquiries
-
-Standard Responses:
-- For security verification: "For your security, I'll need to verify your identity. Can you please provide [specific non-sensitive information]?"
-- For out-of-scope requests: "I understand this is important. For [specific issue], I'll need to connect you with our specialized team who can assist you better."
-- For unclear requests: "To help you more effectively, could you provide more details about [specific aspect]?"
-```
-
-Now, based on the user's answers and inspired by the structure and clarity of these examples, you need to generate TWO things:
-
-1. **system_prompt**: A professional, comprehensive system prompt that incorporates all the information provided above. 
-   The prompt should be:
-   - Ready to use directly as a system message
-   - Well-structured with clear sections
-   - Specific and actionable
-   - Professional yet natural
-
-2. **example_questions**: A list of 4-5 realistic questions that users might ask this AI assistant, based on:
-   - The assistant's domain and role
-   - Common scenarios in this context
-   - Different types of inquiries (simple, complex, edge cases)
-   - Varied question formats (short/long, general/specific)
-
-Examples of good example_questions for different domains:
-- E-commerce: "Quelles chaussures de running recommandez-vous pour un débutant ?", "Comment retourner un article ?", "Avez-vous des promotions en cours ?", "Quelle est la durée de livraison ?"
-- Tech Support: "Mon application ne se lance pas, que faire ?", "Comment réinitialiser mon mot de passe ?", "L'export Excel ne fonctionne plus"
-- Banking: "Quel est mon solde actuel ?", "Comment activer ma carte bancaire ?", "Puis-je augmenter mon plafond de paiement ?"
-
-Return your response in the following JSON structure."""
-
-        try:
-            completion = self.client.beta.chat.completions.parse(
-                model=self.deployment,
-                messages=[
-                    {"role": "system", "content": "You are an expert at creating effective system prompts for AI assistants."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format=PromptWithExamples,
-                temperature=0.7,
-                max_tokens=3000
-            )
-            
-            result = completion.choices[0].message.parsed
-            return result.system_prompt, result.example_questions
-        
-        except Exception as e:
-            raise Exception(f"Erreur lors de la génération du prompt: {str(e)}")
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=_TOLK_CONNECT_RETRIES,
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8)
+        ),
+        timeout=30.0,
+        headers={"Content-Type": "application/json"}
+    )
 
 
 class ChatbotTester:
     """Handles Tolk.ai API integration for chatbot testing"""
     
-    def __init__(self, project_id: str, system_prompt: str):
+    def __init__(self, project_id: str, client: "httpx.AsyncClient"):
         self.project_id = project_id
-        self.system_prompt = system_prompt
+        # Shared HTTP client, passed in so it is resolved on the script thread
+        self.client = client
         self.api_url = f"https://genii-messages-01.tolk.ai/v1/projects/{project_id}/answer"
+        # Stable IDs for the whole chat session
+        self.conversation_id = uuid.uuid4().hex
+        self.user_id = uuid.uuid4().hex
     
-    def generate_uuid(self) -> str:
-        """Generate a UUID for conversation and user IDs"""
-        return str(uuid.uuid4())
-    
-    def send_message(self, message: str, language: str = "fr", model: str = "gpt-4o-mini") -> dict:
-        """Send a message to the chatbot and get response"""
+    async def send_message(
+        self,
+        message: str,
+        system_prompt: str,
+        language: str = "fr",
+        model: str = "gpt-4o-mini",
+        conversation_id: Optional[str] = None
+    ) -> dict:
+        """Send a message to the chatbot and get response
+        
+        conversation_id overrides the tester's own conversation, for one-off messages.
+        """
+        import httpx
+        import orjson
         
         request_body = {
             "conversation": {
-                "id": self.generate_uuid()
+                "id": conversation_id or self.conversation_id
             },
             "message": {
                 "text": message.strip()
@@ -277,32 +96,34 @@ class ChatbotTester:
                 "resource": None
             },
             "user": {
-                "id": self.generate_uuid(),
+                "id": self.user_id,
                 "language": language
             },
             "history": [],
             "promptConfig": {
-                "value": self.system_prompt,
+                "value": system_prompt,
                 "temperature": 0,
                 "model": model
             }
         }
         
         try:
-            response = requests.post(
-                self.api_url,
-                json=request_body,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
+            payload = orjson.dumps(request_body)
+            
+            # Retry transient errors with exponential backoff
+            for attempt in range(_TOLK_MAX_RETRIES + 1):
+                response = await self.client.post(self.api_url, content=payload)
+                if response.status_code not in _TOLK_RETRY_STATUSES or attempt == _TOLK_MAX_RETRIES:
+                    break
+                await asyncio.sleep(0.3 * 2 ** attempt)
             
-            if not response.ok:
+            if not response.is_success:
                 return {
                     "status": "error",
                     "text": f"HTTP error! status: {response.status_code}, body: {response.text}"
                 }
             
-            data = response.json()
+            data = orjson.loads(response.content)
             
             # Try to extract text from response
             if data.get('answer', {}).get('text'):
@@ -310,7 +131,11 @@ class ChatbotTester:
             elif data.get('content'):
                 content = data['content']
                 if isinstance(content, list):
-                    text_content = next((item.get('text') for item in content if item.get('text')), None)
+                    # Responses usually carry a single chunk: check it first, scan the rest only if needed
+                    first = content[0]
+                    text_content = first.get('text') if isinstance(first, dict) else None
+                    if not text_content and len(content) > 1:
+                        text_content = next((item.get('text') for item in content[1:] if item.get('text')), None)
                     if text_content:
                         return {"status": "success", "text": text_content}
                 elif isinstance(content, str):
@@ -318,10 +143,178 @@ class ChatbotTester:
             
             return {"status": "error", "text": "Unable to extract text from API response"}
         
-        except requests.Timeout:
+        except httpx.TimeoutException:
             return {"status": "error", "text": "Request timed out. Please try again."}
         except Exception as e:
             return {"status": "error", "text": f"Error: {str(e)}"}
+    
+    async def test_all(self, questions: List[str], **kwargs) -> List[dict]:
+        """Send all questions concurrently and get the responses in the same order
+        
+        Each question is sent in its own conversation so the tests stay independent.
+        """
+        results = await asyncio.gather(
+            *[self.send_message(question, conversation_id=uuid.uuid4().hex, **kwargs) for question in questions],
+            return_exceptions=True
+        )
+        return [
+            {"status": "error", "text": f"Error: {str(result)}"} if isinstance(result, BaseException) else result
+            for result in results
+        ]
+
+
+@st.cache_resource(show_spinner=False)
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """Background event loop shared across reruns
+    
+    Cached async clients keep connections bound to the loop that opened them,
+    so every coroutine must run on this same loop instead of a fresh asyncio.run().
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def run_async(coro):
+    """Run a coroutine on the shared background loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop()).result()
+
+
+def iter_async(agen: AsyncIterator) -> Iterator:
+    """Iterate an async generator from synchronous code on the shared background loop"""
+    while True:
+        try:
+            yield run_async(agen.__anext__())
+        except StopAsyncIteration:
+            return
+
+
+@st.cache_resource(show_spinner=False)
+def get_prompt_generator(model_name: str) -> PromptGenerator:
+    """Get a PromptGenerator reused across reruns, one per model"""
+    return PromptGenerator(model_name=model_name)
+
+
+@st.cache_resource(show_spinner=False)
+def _generation_cache() -> OrderedDict:
+    """Exact-match cache of generated prompts shared across sessions
+    
+    Maps the answers key to (timestamp, (system_prompt, example_questions)), oldest
+    first, and holds at most _GENERATION_CACHE_MAX_ENTRIES entries.
+    """
+    return OrderedDict()
+
+
+@st.cache_resource(show_spinner=False)
+def _disk_cache() -> tuple[Optional[shelve.Shelf], threading.Lock]:
+    """Persistent cache of generated prompts, kept across app restarts
+    
+    Entries have the same (timestamp, value) layout as the in-memory cache. Sessions
+    run in separate threads and shelve is not thread-safe, hence the lock. The shelf
+    is None when the filesystem is read-only or unavailable, in which case only the
+    in-memory cache is used.
+    """
+    try:
+        shelf = shelve.open(_DISK_CACHE_PATH)
+    except (OSError, *dbm.error):
+        shelf = None
+    return shelf, threading.Lock()
+
+
+def _remember(cache: OrderedDict, key: str, entry: tuple):
+    """Store an entry in the in-memory cache, evicting the oldest ones beyond the cap"""
+    cache[key] = entry
+    cache.move_to_end(key)
+    while len(cache) > _GENERATION_CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+
+
+def _sweep_disk_cache(disk_cache: shelve.Shelf, now: float):
+    """Delete expired entries from the disk cache (caller holds the lock)"""
+    for key in list(disk_cache.keys()):
+        if now - disk_cache[key][0] >= _GENERATION_CACHE_TTL:
+            del disk_cache[key]
+
+
+def _answers_key(model_name: str, *answers: str) -> str:
+    """Hash the generation settings, model name and normalized answers into a cache key"""
+    normalized = "|".join([GENERATION_FINGERPRINT, model_name] + [answer.strip().lower() for answer in answers])
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def cached_generate(
+    model_name: str,
+    activite: str,
+    regles: str,
+    personnalite: str,
+    scenarios: str,
+    on_partial: Optional[Callable[[str], None]] = None
+) -> tuple[str, List[str]]:
+    """Generate a system prompt, reusing the result for identical answers within the TTL
+    
+    Results are kept in memory and on disk, so they also survive app restarts. On a
+    cache miss the response is streamed and on_partial is called with the system
+    prompt generated so far.
+    """
+    key = _answers_key(model_name, activite, regles, personnalite, scenarios)
+    cache = _generation_cache()
+    disk_cache, lock = _disk_cache()
+    
+    hit = cache.get(key)
+    if hit is None and disk_cache is not None:
+        with lock:
+            try:
+                hit = disk_cache.get(key)
+            except (OSError, *dbm.error):
+                hit = None
+        if hit is not None:
+            _remember(cache, key, hit)
+    if hit is not None:
+        if time.time() - hit[0] < _GENERATION_CACHE_TTL:
+            return hit[1]
+        # Expired: drop it so stale entries don't accumulate
+        cache.pop(key, None)
+    
+    answers = {
+        'activite': activite,
+        'regles': regles,
+        'personnalite': personnalite,
+        'scenarios': scenarios
+    }
+    result = None
+    for item in iter_async(get_prompt_generator(model_name).stream_system_prompt(answers)):
+        if isinstance(item, PromptWithExamples):
+            result = item
+        elif on_partial:
+            on_partial(item.get('system_prompt', ''))
+    
+    # Only a complete, strictly validated response may be cached
+    if result is None:
+        raise Exception("Erreur lors de la génération du prompt: réponse incomplète")
+    now = time.time()
+    entry = (now, (result.system_prompt, result.example_questions))
+    _remember(cache, key, entry)
+    if disk_cache is not None:
+        with lock:
+            try:
+                _sweep_disk_cache(disk_cache, now)
+                disk_cache[key] = entry
+                disk_cache.sync()
+            except (OSError, *dbm.error):
+                pass
+    return entry[1]
+
+
+def get_chatbot_tester(project_id: str) -> ChatbotTester:
+    """Get the ChatbotTester of the current session for a project
+    
+    Stored in session state rather than st.cache_resource since each tester
+    carries its own conversation and user IDs, which must not be shared between users.
+    """
+    tester = st.session_state.tester
+    if tester is None or tester.project_id != project_id:
+        tester = st.session_state.tester = ChatbotTester(project_id=project_id, client=_tolk_client())
+    return tester
 
 
 def initialize_session_state():
@@ -330,14 +323,145 @@ def initialize_session_state():
         st.session_state.generated_prompt = None
     if 'example_questions' not in st.session_state:
         st.session_state.example_questions = []
+    if 'example_question_buttons' not in st.session_state:
+        st.session_state.example_question_buttons = []
     if 'messages' not in st.session_state:
         st.session_state.messages = []
     if 'project_id' not in st.session_state:
         st.session_state.project_id = ""
-    if 'prompt_edited' not in st.session_state:
-        st.session_state.prompt_edited = None
     if 'clicked_question' not in st.session_state:
         st.session_state.clicked_question = None
+    if 'prompt_variants' not in st.session_state:
+        st.session_state.prompt_variants = []
+    if 'tester' not in st.session_state:
+        st.session_state.tester = None
+
+
+def set_example_questions(questions: List[str]):
+    """Store example questions along with their button labels and keys, built once"""
+    st.session_state.example_questions = questions
+    st.session_state.example_question_buttons = [
+        (f"💬 {question}", f"example_q_{idx}", question)
+        for idx, question in enumerate(questions)
+    ]
+
+
+def select_variant():
+    """Load the variant picked in the variant selector"""
+    prompt, example_questions = st.session_state.prompt_variants[st.session_state.variant_choice]
+    st.session_state.generated_prompt = prompt
+    st.session_state.prompt_editor = prompt
+    set_example_questions(example_questions)
+
+
+@st.fragment
+def chat_fragment(project_id: str, language: str, model: str):
+    """Chat interface, rerun on its own so chat interactions don't rerun the whole page"""
+    if not project_id.strip():
+        st.warning("⚠️ Entrez un Project ID dans la configuration")
+        return
+    
+    tester = get_chatbot_tester(project_id)
+    
+    # Fixed-height scrollable region for the conversation
+    history = st.container(height=500)
+    
+    with history:
+        # Display chat history
+        for message in st.session_state.messages:
+            with st.chat_message(message["role"]):
+                st.write(message["content"])
+        
+        # Display example questions as clickable buttons if no messages yet
+        if not st.session_state.messages and st.session_state.example_question_buttons:
+            st.markdown("**💡 Questions suggérées :**")
+            st.caption("Cliquez pour démarrer")
+            
+            # Display questions as buttons
+            for label, key, question in st.session_state.example_question_buttons:
+                if st.button(
+                    label,
+                    key=key,
+                    use_container_width=True,
+                    type="secondary"
+                ):
+                    st.session_state.clicked_question = question
+                    st.rerun(scope="fragment")
+            
+            if st.button("🧪 Tester toutes les questions", use_container_width=True):
+                with st.spinner("Test des questions..."):
+                    responses = run_async(tester.test_all(
+                        st.session_state.example_questions,
+                        system_prompt=st.session_state.prompt_editor,
+                        language=language,
+                        model=model
+                    ))
+                for question, response in zip(st.session_state.example_questions, responses):
+                    st.session_state.messages.append({"role": "user", "content": question})
+                    st.session_state.messages.append({
+                        "role": "assistant",
+                        "content": response["text"] if response["status"] == "success" else f"❌ Erreur: {response['text']}"
+                    })
+                st.rerun(scope="fragment")
+    
+    # Handle clicked question from button
+    user_input = None
+    if st.session_state.clicked_question:
+        user_input = st.session_state.clicked_question
+        st.session_state.clicked_question = None
+    
+    # Chat input
+    if not user_input:
+        user_input = st.chat_input("Posez votre question...")
+    
+    if user_input:
+        # Add user message to chat
+        st.session_state.messages.append({"role": "user", "content": user_input})
+        
+        with history:
+            with st.chat_message("user"):
+                st.write(user_input)
+            
+            # Get bot response
+            with st.chat_message("assistant"):
+                with st.spinner("Réflexion..."):
+                    try:
+                        response = run_async(tester.send_message(
+                            message=user_input,
+                            system_prompt=st.session_state.prompt_editor,
+                            language=language,
+                            model=model
+                        ))
+                        
+                        if response["status"] == "success":
+                            st.write(response["text"])
+                            st.session_state.messages.append({
+                                "role": "assistant",
+                                "content": response["text"]
+                            })
+                        else:
+                            error_msg = f"❌ Erreur: {response['text']}"
+                            st.error(error_msg)
+                            st.session_state.messages.append({
+                                "role": "assistant",
+                                "content": error_msg
+                            })
+                    
+                    except Exception as e:
+                        error_msg = f"❌ Erreur: {str(e)}"
+                        st.error(error_msg)
+                        st.session_state.messages.append({
+                            "role": "assistant",
+                            "content": error_msg
+                        })
+    
+    # Clear chat button
+    if st.session_state.messages:
+        if st.button("🗑️ Effacer", use_container_width=True):
+            st.session_state.messages = []
+            # Start a new conversation on the next message
+            st.session_state.tester = None
+            st.rerun(scope="fragment")
 
 
 def main():
@@ -396,21 +520,53 @@ def main():
             else:
                 with st.spinner("Génération en cours..."):
                     try:
-                        generator = PromptGenerator(model_name=model_choice)
+                        preview = st.empty()
+                        prompt, example_questions = cached_generate(
+                            model_choice,
+                            activite.strip(),
+                            regles.strip(),
+                            personnalite.strip(),
+                            scenarios.strip(),
+                            on_partial=preview.markdown
+                        )
+                        st.session_state.prompt_variants = []
+                        st.session_state.generated_prompt = prompt
+                        st.session_state.prompt_editor = prompt
+                        set_example_questions(example_questions)
+                        st.success("✅ Généré !")
+                        st.rerun()
+                    
+                    except TruncatedResponseError:
+                        st.error("✂️ Réponse tronquée : le prompt a dépassé la limite de tokens et n'a pas été gardé. Réessayez ou raccourcissez vos réponses.")
+                    except Exception as e:
+                        st.error(f"❌ Erreur: {str(e)}")
+        
+        if st.button("🎲 3 variantes", use_container_width=True):
+            if not activite.strip():
+                st.error("⚠️ Décrivez au minimum l'activité")
+            else:
+                with st.spinner("Génération des variantes..."):
+                    try:
+                        generator = get_prompt_generator(model_choice)
                         answers = {
-                            'activite': activite,
-                            'regles': regles,
-                            'personnalite': personnalite,
-                            'scenarios': scenarios
+                            'activite': activite.strip(),
+                            'regles': regles.strip(),
+                            'personnalite': personnalite.strip(),
+                            'scenarios': scenarios.strip()
                         }
                         
-                        prompt, example_questions = generator.generate_system_prompt(answers)
+                        variants = run_async(generator.generate_n(answers, n=3))
+                        prompt, example_questions = variants[0]
+                        st.session_state.prompt_variants = variants
+                        st.session_state.variant_choice = 0
                         st.session_state.generated_prompt = prompt
-                        st.session_state.prompt_edited = prompt
-                        st.session_state.example_questions = example_questions
-                        st.success("✅ Généré !")
+                        st.session_state.prompt_editor = prompt
+                        set_example_questions(example_questions)
+                        st.success("✅ Variantes générées !")
                         st.rerun()
                     
+                    except TruncatedResponseError:
+                        st.error("✂️ Réponse tronquée : le prompt a dépassé la limite de tokens et n'a pas été gardé. Réessayez ou raccourcissez vos réponses.")
                     except Exception as e:
                         st.error(f"❌ Erreur: {str(e)}")
     
@@ -423,18 +579,26 @@ def main():
         with left_col:
             st.subheader("📝 System Prompt")
             
-            edited_prompt = st.text_area(
+            # Variant picker when several prompts were generated at once
+            if len(st.session_state.prompt_variants) > 1:
+                st.radio(
+                    "Variante",
+                    options=range(len(st.session_state.prompt_variants)),
+                    format_func=lambda idx: f"Variante {idx + 1}",
+                    horizontal=True,
+                    key="variant_choice",
+                    on_change=select_variant,
+                    label_visibility="collapsed"
+                )
+            
+            # The widget keeps the edited prompt in st.session_state.prompt_editor
+            st.text_area(
                 "Modifiez le prompt si nécessaire:",
-                value=st.session_state.prompt_edited,
                 height=300,
                 key="prompt_editor",
                 label_visibility="collapsed"
             )
             
-            # Update the edited prompt in session state
-            if edited_prompt != st.session_state.prompt_edited:
-                st.session_state.prompt_edited = edited_prompt
-            
             st.markdown("---")
             st.subheader("⚙️ Configuration")
             
@@ -469,92 +633,7 @@ def main():
         # RIGHT COLUMN: Chat Interface
         with right_col:
             st.subheader("💬 Test du Prompt")
-            
-            if not project_id.strip():
-                st.warning("⚠️ Entrez un Project ID dans la configuration")
-            else:
-                # Display chat history
-                for message in st.session_state.messages:
-                    with st.chat_message(message["role"]):
-                        st.write(message["content"])
-                
-                # Display example questions as clickable buttons if no messages yet
-                if not st.session_state.messages and st.session_state.example_questions:
-                    st.markdown("**💡 Questions suggérées :**")
-                    st.caption("Cliquez pour démarrer")
-                    
-                    # Display questions as buttons
-                    for idx, question in enumerate(st.session_state.example_questions):
-                        if st.button(
-                            f"💬 {question}",
-                            key=f"example_q_{idx}",
-                            use_container_width=True,
-                            type="secondary"
-                        ):
-                            st.session_state.clicked_question = question
-                            st.rerun()
-                    
-                    st.markdown("")
-                
-                # Handle clicked question from button
-                user_input = None
-                if hasattr(st.session_state, 'clicked_question') and st.session_state.clicked_question:
-                    user_input = st.session_state.clicked_question
-                    st.session_state.clicked_question = None
-                
-                # Chat input
-                if not user_input:
-                    user_input = st.chat_input("Posez votre question...")
-                
-                if user_input:
-                    # Add user message to chat
-                    st.session_state.messages.append({"role": "user", "content": user_input})
-                    
-                    with st.chat_message("user"):
-                        st.write(user_input)
-                    
-                    # Get bot response
-                    with st.chat_message("assistant"):
-                        with st.spinner("Réflexion..."):
-                            try:
-                                tester = ChatbotTester(
-                                    project_id=project_id,
-                                    system_prompt=st.session_state.prompt_edited
-                                )
-                                
-                                response = tester.send_message(
-                                    message=user_input,
-                                    language=language,
-                                    model=model
-                                )
-                                
-                                if response["status"] == "success":
-                                    st.write(response["text"])
-                                    st.session_state.messages.append({
-                                        "role": "assistant",
-                                        "content": response["text"]
-                                    })
-                                else:
-                                    error_msg = f"❌ Erreur: {response['text']}"
-                                    st.error(error_msg)
-                                    st.session_state.messages.append({
-                                        "role": "assistant",
-                                        "content": error_msg
-                                    })
-                            
-                            except Exception as e:
-                                error_msg = f"❌ Erreur: {str(e)}"
-                                st.error(error_msg)
-                                st.session_state.messages.append({
-                                    "role": "assistant",
-                                    "content": error_msg
-                                })
-                
-                # Clear chat button
-                if st.session_state.messages:
-                    if st.button("🗑️ Effacer", use_container_width=True):
-                        st.session_state.messages = []
-                        st.rerun()
+            chat_fragment(project_id, language, model)
     
     else:
         st.info("👈 Remplissez les questions dans la sidebar et cliquez sur 'Générer' pour commencer")